@@ -0,0 +1,104 @@
+""" Build deals.bin, the library of winnable deals used by the game's winnable deals only option.
+
+Run offline, it solves deals on every core and keeps the ones it can win. Each win is checked by playing it through
+the game itself, headless, so a solver that gets a rule wrong can't put an unwinnable deal in the library.
+
+    python build_deals.py --per-band 100000
+"""
+import os
+
+# Has to be set before arcade is imported anywhere
+os.environ.setdefault("ARCADE_HEADLESS", "1")
+
+import argparse
+import multiprocessing
+import time
+
+import solver
+from deal_library import DealLibrary, DRAW_COUNTS, DIFFICULTY_BANDS, write_library
+from fuzz import FuzzRun
+
+# Difficulty band by how many positions the solver looked at before it found the win. Any win that took more
+# positions, up to --node-limit, is hard
+BAND_NODE_LIMITS = {"easy": 200, "medium": 2000}
+
+
+def band_for(nodes):
+    for band, most_nodes in BAND_NODE_LIMITS.items():
+        if nodes <= most_nodes:
+            return band
+    return "hard"
+
+
+# the game a worker process plays the wins through, made by start_worker
+worker_run = None
+
+
+def start_worker():
+    global worker_run
+    worker_run = FuzzRun()
+
+
+def check_seed(job):
+    """ Solve one deal. Returns (draw count, seed, band), band is None if the deal isn't a sure win. """
+    draw_count, seed, node_limit = job
+    position = solver.deal_position(seed)
+    result, moves, nodes = solver.solve(position, draw_count, node_limit)
+    if result != solver.WON:
+        return draw_count, seed, None
+    failure = worker_run.play(seed, draw_count, moves)
+    if failure is not None:
+        raise RuntimeError(f"solution for seed {seed} with draw {draw_count} doesn't win in the game: {failure}")
+    return draw_count, seed, band_for(nodes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", default="deals.bin", help="library file to write")
+    parser.add_argument("--per-band", type=int, default=1000, help="deals wanted in each draw count and band")
+    parser.add_argument("--start-seed", type=int, default=0, help="first seed to try")
+    parser.add_argument("--node-limit", type=int, default=solver.DEFAULT_NODE_LIMIT,
+                        help="give up on a deal after this many positions")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes to solve with")
+    parser.add_argument("--max-seeds", type=int, default=None, help="stop after trying this many seeds")
+    parser.add_argument("--append", action="store_true", help="keep the deals already in --out")
+    args = parser.parse_args()
+
+    seeds = {(draw_count, band): [] for draw_count in DRAW_COUNTS for band in DIFFICULTY_BANDS}
+    if args.append:
+        library = DealLibrary.open(args.out)
+        if library is not None:
+            for key, band_seeds in seeds.items():
+                band_seeds.extend(library.seed_at(*key, index) for index in range(library.count(*key)))
+            library.close()
+
+    def jobs():
+        # each seed is tried for every draw count that still needs deals
+        seed = args.start_seed
+        end_seed = 2 ** 32 if args.max_seeds is None else min(2 ** 32, args.start_seed + args.max_seeds)
+        while seed < end_seed:
+            for draw_count in DRAW_COUNTS:
+                if any(len(seeds[draw_count, band]) < args.per_band for band in DIFFICULTY_BANDS):
+                    yield draw_count, seed, args.node_limit
+            seed += 1
+
+    started = time.perf_counter()
+    tried = 0
+    with multiprocessing.Pool(args.workers, initializer=start_worker) as pool:
+        for draw_count, seed, band in pool.imap_unordered(check_seed, jobs(), chunksize=16):
+            tried += 1
+            if band is not None and len(seeds[draw_count, band]) < args.per_band:
+                seeds[draw_count, band].append(seed)
+            if tried % 1000 == 0:
+                counts = ", ".join(f"draw {d} {b}: {len(s)}" for (d, b), s in seeds.items())
+                print(f"{tried} deals tried in {time.perf_counter() - started:.0f}s - {counts}")
+            if all(len(band_seeds) >= args.per_band for band_seeds in seeds.values()):
+                break
+        pool.terminate()
+
+    write_library(args.out, seeds)
+    print(f"Wrote {sum(len(band_seeds) for band_seeds in seeds.values())} deals to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
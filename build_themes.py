@@ -0,0 +1,34 @@
+""" Build themes.bin, the theme photos scaled to the game window, so picking a theme never decodes a JPEG.
+
+Run offline, again whenever a photo or the window size changes.
+
+    python build_themes.py
+"""
+import argparse
+import glob
+import os
+import time
+
+from solitaire import WINDOW_WIDTH, WINDOW_HEIGHT, THEME_PACK_FILE
+from theme_pack import scale_photo, write_pack
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", default=THEME_PACK_FILE, help="pack file to write")
+    parser.add_argument("--photos", default="theme_photos", help="folder with the theme photos")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    images = {}
+    for path in sorted(glob.glob(os.path.join(args.photos, "*.jpg"))):
+        # named the way the game's theme_setting names them
+        images[path.replace(os.sep, "/")] = scale_photo(path, WINDOW_WIDTH, WINDOW_HEIGHT)
+
+    write_pack(args.out, WINDOW_WIDTH, WINDOW_HEIGHT, images)
+    print(f"Wrote {len(images)} themes at {WINDOW_WIDTH}x{WINDOW_HEIGHT} to {args.out} "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,56 @@
 import arcade
+import random  # for shuffling the card ids of a deal
 
 FACE_DOWN_IMAGE = ":resources:images/cards/cardBack_blue4.png"
 
+CARD_VALUES = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]
+CARD_SUITS = ["Clubs", "Hearts", "Spades", "Diamonds"]
+CARD_COUNT = len(CARD_SUITS) * len(CARD_VALUES)
+
+# Every card is an id from 0 to 51 (suit index * 13 + rank - 1), with its rank, suit and colour worked out once here
+CARD_RANKS = tuple(card_id % len(CARD_VALUES) + 1 for card_id in range(CARD_COUNT))
+CARD_SUIT_INDEXES = tuple(card_id // len(CARD_VALUES) for card_id in range(CARD_COUNT))
+CARD_IS_RED = tuple(CARD_SUITS[suit_index] in ("Hearts", "Diamonds") for suit_index in CARD_SUIT_INDEXES)
+
+# CAN_STACK_ON_TABLEAU[card_id][target_id]: card is one lower than target and the other colour
+CAN_STACK_ON_TABLEAU = tuple(
+    bytes(CARD_IS_RED[card_id] != CARD_IS_RED[target_id] and CARD_RANKS[card_id] == CARD_RANKS[target_id] - 1
+          for target_id in range(CARD_COUNT))
+    for card_id in range(CARD_COUNT))
+
+# CAN_FOLLOW_ON_FOUNDATION[card_id][target_id]: card is one higher than target and the same suit
+CAN_FOLLOW_ON_FOUNDATION = tuple(
+    bytes(CARD_SUIT_INDEXES[card_id] == CARD_SUIT_INDEXES[target_id] and CARD_RANKS[card_id] == CARD_RANKS[target_id] + 1
+          for target_id in range(CARD_COUNT))
+    for card_id in range(CARD_COUNT))
+
+
+def shuffle_card_ids(seed):
+    """ Card ids of a deal in the order they go into the stock. The same seed always gives the same deal. """
+    rng = random.Random(seed)
+    card_ids = list(range(CARD_COUNT))
+    for pos1 in range(CARD_COUNT):
+        pos2 = rng.randrange(CARD_COUNT)
+        card_ids[pos1], card_ids[pos2] = card_ids[pos2], card_ids[pos1]
+    return card_ids
+
+
 class Card(arcade.Sprite):
     """ Card sprite """
 
+    # rule-side data, looked up by the move checks
+    __slots__ = ("card_id", "rank", "suit_index", "is_red")
+
     def __init__(self, suit, value, scale=1):
         """ Card constructor """
 
         # Attributes for suit and value
         self.suit = suit
         self.value = value
+        self.card_id = CARD_SUITS.index(suit) * len(CARD_VALUES) + CARD_VALUES.index(value)
+        self.rank = CARD_RANKS[self.card_id]
+        self.suit_index = CARD_SUIT_INDEXES[self.card_id]
+        self.is_red = CARD_IS_RED[self.card_id]
         #to keep track of the card if it has been on the foundation pile once
         self.was_at_foundation_once = False
 
@@ -21,13 +61,14 @@ class Card(arcade.Sprite):
         # Call the parent
         super().__init__(FACE_DOWN_IMAGE, scale, hit_box_algorithm="None")
 
-    # card face down
+    # card face down. load_texture keeps every texture it loaded, and cards are plain rectangles so they skip
+    # the per-pixel hit box scan
     def face_down(self):
-        self.texture = arcade.load_texture(FACE_DOWN_IMAGE)
+        self.texture = arcade.load_texture(FACE_DOWN_IMAGE, hit_box_algorithm="None")
         self.is_face_up = False
 
     def face_up(self):
-        self.texture = arcade.load_texture(self.image_file_name)
+        self.texture = arcade.load_texture(self.image_file_name, hit_box_algorithm="None")
         self.is_face_up = True
 
     def is_face_down(self):
@@ -36,19 +77,19 @@ class Card(arcade.Sprite):
 
     def get_color(self):
         """ Get the color of the card based on its suit. """
-        if self.suit in ("Hearts", "Diamonds"):
-            return "Red"
-        else:
-            return "Black"
+        return "Red" if self.is_red else "Black"
 
     def get_value(self):
         """ Get the numerical value of the card. A is 1, J is 11, Q is 12, and K is 13. """
-        if self.value == "A":
-            return 1
-        elif self.value in ("J", "Q", "K"):
-            return 11 if self.value == "J" else 12 if self.value == "Q" else 13
-        else:
-            return int(self.value)
+        return self.rank
+
+    def can_stack_on_tableau(self, top_card):
+        """ Can this card go on top_card in a tableau pile? """
+        return CAN_STACK_ON_TABLEAU[self.card_id][top_card.card_id] == 1
+
+    def can_follow_on_foundation(self, top_card):
+        """ Can this card go on top_card in a foundation pile? """
+        return CAN_FOLLOW_ON_FOUNDATION[self.card_id][top_card.card_id] == 1
 
      # get suit
     def get_suit(self):
@@ -0,0 +1,60 @@
+import random
+import struct
+
+from mapped_file import MappedFile, write_atomically
+
+# Header: magic, then (offset, count) of the seed array for each draw count and difficulty band
+LIBRARY_MAGIC = b"SOLDEAL1"
+DRAW_COUNTS = (1, 3)
+DIFFICULTY_BANDS = ("easy", "medium", "hard")
+ENTRY_FORMAT = "<QQ"
+SEED_FORMAT = "<I"
+HEADER_SIZE = len(LIBRARY_MAGIC) + struct.calcsize(ENTRY_FORMAT) * len(DRAW_COUNTS) * len(DIFFICULTY_BANDS)
+
+
+class DealLibrary(MappedFile):
+    """ Seeds of deals already known to be winnable, grouped by draw count and difficulty band """
+
+    MAGIC = LIBRARY_MAGIC
+
+    def read_header(self):
+        # (draw count, band) -> (offset, count)
+        self.entries = {}
+        offset = len(LIBRARY_MAGIC)
+        for draw_count in DRAW_COUNTS:
+            for band in DIFFICULTY_BANDS:
+                seeds_offset, count = self.unpack(ENTRY_FORMAT, offset)
+                self.need(seeds_offset + count * struct.calcsize(SEED_FORMAT))
+                self.entries[draw_count, band] = seeds_offset, count
+                offset += struct.calcsize(ENTRY_FORMAT)
+
+    def count(self, draw_count, band):
+        """ How many deals there are for this draw count and band """
+        return self.entries[draw_count, band][1]
+
+    def seed_at(self, draw_count, band, index):
+        """ The index-th seed for this draw count and band """
+        offset, count = self.entries[draw_count, band]
+        if not 0 <= index < count:
+            raise IndexError(index)
+        return struct.unpack_from(SEED_FORMAT, self.data, offset + index * struct.calcsize(SEED_FORMAT))[0]
+
+    def random_seed(self, draw_count, band):
+        """ A random seed for this draw count and band, or None if there aren't any """
+        count = self.count(draw_count, band)
+        if count == 0:
+            return None
+        return self.seed_at(draw_count, band, random.randrange(count))
+
+
+def write_library(path, seeds):
+    """ Write a library file. seeds maps (draw count, band) to a list of seeds. """
+    header = bytearray(LIBRARY_MAGIC)
+    body = bytearray()
+    for draw_count in DRAW_COUNTS:
+        for band in DIFFICULTY_BANDS:
+            band_seeds = seeds.get((draw_count, band), [])
+            header += struct.pack(ENTRY_FORMAT, HEADER_SIZE + len(body), len(band_seeds))
+            body += struct.pack(f"<{len(band_seeds)}I", *band_seeds)
+
+    write_atomically(path, [header, body])
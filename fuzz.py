@@ -0,0 +1,362 @@
+""" Drive the Solitaire handlers with random mouse and key events and check the game's invariants after each one.
+
+Runs arcade headless, so it needs no display. Every run is reproducible from its seed, and a failing run is
+shrunk to the fewest events that still fail before it is printed.
+
+    python fuzz.py --runs 100 --events 20000
+"""
+import os
+
+# Has to be set before arcade is imported anywhere
+os.environ.setdefault("ARCADE_HEADLESS", "1")
+
+import argparse
+import json
+import random
+import time
+import traceback
+
+import arcade
+
+import solver
+from card import CARD_COUNT
+from solitaire import Solitaire, STOCK_PILE, TALON_PILE, TABLEAU_PILE_1, TABLEAU_PILE_7, FOUNDATION_PILE_1, \
+    FOUNDATION_PILE_4
+
+# keys the game handles, and one it doesn't
+KEYS = [arcade.key.R, arcade.key.S, arcade.key.O, arcade.key.C, arcade.key.K, arcade.key.N, arcade.key.T,
+        arcade.key.D, arcade.key.A]
+
+# Vegas scoring: a game costs 52 and each card gets 5 the first time it reaches a foundation
+GAME_COST = 52
+MOST_POINTS_PER_GAME = 5 * CARD_COUNT - GAME_COST
+
+# the longest gap between two clicks on cards that still counts as a double click
+DOUBLE_CLICK_TIME = 0.6
+
+
+class VirtualClock:
+    """ Stands in for time.time so double clicks, and the minute wrapping, happen when the fuzzer says """
+
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FuzzRun:
+    """ One window, replayed from a fresh deal for every run """
+
+    def __init__(self, draw_every=0):
+        self.window = Solitaire()
+        self.draw_every = draw_every
+
+    def reset(self, seed):
+        """ Put the window back the way the game starts, on the deal for seed """
+        window = self.window
+        # new game keys deal from the global random, seed it too so the run replays exactly
+        random.seed(seed)
+        window.score = -52
+        window.winning_status = False
+        window.game_mode_flag = True
+        window.draw3_option = False
+        window.cumulative_option = False
+        window.deal_difficulty = None
+        # hints search on other threads, which would make runs depend on timing
+        window.show_hints = False
+        window.hint_worker.cancel()
+        window.current_theme_index = 0
+        window.set_theme()
+        window.click_count = 0
+        window.threshold_to_meet = 0
+        window.clock = VirtualClock(random.Random(seed).uniform(0, 3600))
+        window.new_game_setup(seed)
+        self.card_list = window.card_list
+        self.games = 1
+        # when a card was last clicked, and the gap before the last click that sent a card to a foundation
+        self.last_card_click = float("-inf")
+        self.double_click_gap = None
+
+    def next_event(self, rng):
+        """ A random but plausible event for the current table """
+        window = self.window
+        roll = rng.random()
+        if window.held_cards:
+            if roll < 0.6:
+                # drag the held cards towards a pile
+                mat = rng.choice(window.pile_mat_list)
+                card = window.held_cards[0]
+                return ["motion", mat.center_x, mat.center_y, round(mat.center_x - card.center_x + rng.uniform(-15, 15)),
+                        round(mat.center_y - card.center_y + rng.uniform(-15, 15))]
+            return ["release", window.held_cards[0].center_x, window.held_cards[0].center_y]
+        if roll < 0.05:
+            return ["key", rng.choice(KEYS)]
+        if roll < 0.25:
+            # time passes: quick double clicks, slow clicks, and sometimes across the minute
+            return ["tick", rng.choice([0.1, 0.3, 0.5, 0.7, 2.0, 30.0, 59.8])]
+        if roll < 0.35:
+            # a click on a mat, often the stock
+            mat = window.pile_mat_list[STOCK_PILE] if rng.random() < 0.5 else rng.choice(window.pile_mat_list)
+            return ["press", mat.center_x, mat.center_y]
+        if roll < 0.95:
+            # a click on a pile's card, usually near its top
+            pile = rng.choice([pile for pile in window.piles if pile] or [[]])
+            if not pile:
+                return ["tick", 1.0]
+            card = pile[-1] if rng.random() < 0.6 else rng.choice(pile)
+            return ["press", card.center_x + rng.uniform(-10, 10), card.center_y + rng.uniform(-10, 10)]
+        return ["release", rng.uniform(0, window.width), rng.uniform(0, window.height)]
+
+    def apply(self, event):
+        window = self.window
+        kind = event[0]
+        self.double_click_gap = None
+        if kind == "press":
+            on_card = len(arcade.get_sprites_at_point((event[1], event[2]), window.card_list)) > 0
+            in_foundations = self.foundation_count()
+            window.on_mouse_press(event[1], event[2], arcade.MOUSE_BUTTON_LEFT, 0)
+            # a press only sends a card to a foundation as the second click of a double click
+            if self.foundation_count() > in_foundations:
+                self.double_click_gap = window.clock() - self.last_card_click
+            if on_card:
+                self.last_card_click = window.clock()
+        elif kind == "release":
+            window.on_mouse_release(event[1], event[2], arcade.MOUSE_BUTTON_LEFT, 0)
+        elif kind == "motion":
+            window.on_mouse_motion(event[1], event[2], event[3], event[4])
+        elif kind == "key":
+            window.on_key_press(event[1], 0)
+        elif kind == "tick":
+            window.clock.now += event[1]
+
+        # a new deal starts another game in the score
+        if window.card_list is not self.card_list:
+            self.card_list = window.card_list
+            self.games = 1 if window.score == -GAME_COST else self.games + 1
+
+    def foundation_count(self):
+        return sum(len(self.window.piles[pile_index]) for pile_index in range(FOUNDATION_PILE_1, FOUNDATION_PILE_4 + 1))
+
+    def check(self):
+        """ The first broken invariant, or None """
+        window = self.window
+        cards = [card for pile in window.piles for card in pile]
+        if len(cards) != CARD_COUNT or len({card.card_id for card in cards}) != CARD_COUNT:
+            return f"piles: {len(cards)} cards, {len({card.card_id for card in cards})} unique"
+        if len(window.card_list) != CARD_COUNT or set(map(id, window.card_list)) != set(map(id, cards)):
+            return "card_list: not the same cards as the piles"
+
+        if any(card.is_face_up for card in window.piles[STOCK_PILE]):
+            return "stock: face up card"
+        if any(card.is_face_down() for card in window.piles[TALON_PILE]):
+            return "talon: face down card"
+
+        for pile_index in range(FOUNDATION_PILE_1, FOUNDATION_PILE_4 + 1):
+            pile = window.piles[pile_index]
+            for position, card in enumerate(pile):
+                if card.get_value() != position + 1 or card.suit != pile[0].suit or card.is_face_down():
+                    return f"foundation {pile_index}: {card.value} of {card.suit} at position {position}"
+
+        for pile_index in range(TABLEAU_PILE_1, TABLEAU_PILE_7 + 1):
+            pile = window.piles[pile_index]
+            for below, card in zip(pile, pile[1:]):
+                if below.is_face_up and not card.can_stack_on_tableau(below):
+                    return f"tableau {pile_index}: {card.value} of {card.suit} on {below.value} of {below.suit}"
+
+        if window.held_cards:
+            pile_index = window.get_pile_for_card(window.held_cards[0])
+            if pile_index is None or window.piles[pile_index][-len(window.held_cards):] != window.held_cards:
+                return "held cards: not the top of one pile"
+
+        if not -GAME_COST * self.games <= window.score <= MOST_POINTS_PER_GAME * self.games:
+            return f"score: {window.score} after {self.games} games"
+
+        if self.double_click_gap is not None and self.double_click_gap > DOUBLE_CLICK_TIME:
+            return f"double click: a card went to a foundation on clicks {self.double_click_gap:.1f}s apart"
+        return None
+
+    def run(self, seed, events):
+        """ Apply events (a list, or a count to generate) from a fresh deal.
+
+        Returns (events applied, failure): failure is None or the invariant that broke, and events stops there.
+        """
+        self.reset(seed)
+        rng = random.Random(seed)
+        generate = isinstance(events, int)
+        count = events if generate else len(events)
+        applied = []
+        for index in range(count):
+            event = self.next_event(rng) if generate else events[index]
+            applied.append(event)
+            failure = self.step(event, self.draw_every and index % self.draw_every == 0)
+            if failure is not None:
+                return applied, failure
+        return applied, None
+
+    def step(self, event, draw=False):
+        """ Apply one event and check the invariants. Returns the failure, or None. """
+        try:
+            self.apply(event)
+            if draw:
+                self.window.request_redraw()
+                self.window.on_draw()
+            return self.check()
+        except Exception:
+            return "exception: " + traceback.format_exc(limit=-1).strip().splitlines()[-1]
+
+    def play(self, seed, draw_count, moves):
+        """ Play a solver's moves on the deal for seed, with the clicks and drags a player would make.
+
+        The game is the judge: after each move the table has to match the position the solver expected, and the
+        last move has to win. Returns None if it does, otherwise what went wrong.
+        """
+        window = self.window
+        self.reset(seed)
+        if draw_count == 3:
+            # drawing three at a time is a Vegas option
+            window.game_mode_flag = False
+            window.draw3_option = True
+        position = solver.deal_position(seed)
+        for move_number, move in enumerate(moves, 1):
+            options = dict(solver.legal_moves(position, draw_count, only_safe_move=False))
+            if move not in options:
+                return f"move {move_number} {move}: the solver doesn't allow it"
+            failure = self.play_move(move)
+            if failure is not None:
+                return f"move {move_number} {move}: {failure}"
+            position = options[move]
+            if solver.position_from_piles(window.piles) != position:
+                return f"move {move_number} {move}: the table isn't the position the solver expected"
+        if not window.winning_status:
+            return "the game isn't won after the last move"
+        return None
+
+    def play_move(self, move):
+        """ Make one solver move on the table, then turn over any face down card it uncovered """
+        window = self.window
+        source, destination, card_id = move
+        if card_id is None:
+            # drawing and turning the talon over are both a click on the stock
+            mat = window.pile_mat_list[STOCK_PILE]
+            failure = self.click(mat.center_x, mat.center_y)
+        else:
+            failure = self.drag(card_id, destination)
+        if failure is not None:
+            return failure
+
+        for pile_index in range(TABLEAU_PILE_1, TABLEAU_PILE_7 + 1):
+            pile = window.piles[pile_index]
+            if pile and pile[-1].is_face_down():
+                point = self.point_on(pile[-1])
+                if point is None:
+                    return "a face down card can't be clicked"
+                failure = self.click(*point)
+                if failure is not None:
+                    return failure
+        return None
+
+    def drag(self, card_id, destination):
+        """ Drag a card, and the cards on it, onto a pile. destination is a solver pile number. """
+        window = self.window
+        card = next(card for card in window.card_list if card.card_id == card_id)
+        if destination == solver.FOUNDATION_PILE:
+            # the foundation of the card's suit, or an empty one for an ace
+            foundations = range(FOUNDATION_PILE_1, FOUNDATION_PILE_4 + 1)
+            pile_index = next((index for index in foundations if window.piles[index]
+                               and window.piles[index][0].suit == card.suit),
+                              next((index for index in foundations if not window.piles[index]), None))
+            if pile_index is None:
+                return "no foundation to put it on"
+        else:
+            pile_index = destination
+
+        point = self.point_on(card)
+        if point is None:
+            return "the card can't be clicked"
+        # a second later, so the press isn't the second click of a double click
+        failure = self.step(["tick", 1.0]) or self.step(["press", *point])
+        if failure is not None:
+            return failure
+        if window.held_cards[:1] != [card]:
+            return "the press didn't pick the card up"
+        mat = window.pile_mat_list[pile_index]
+        failure = self.step(["motion", mat.center_x, mat.center_y, mat.center_x - card.center_x,
+                             mat.center_y - card.center_y]) or self.step(["release", mat.center_x, mat.center_y])
+        if failure is not None:
+            return failure
+        if window.get_pile_for_card(card) != pile_index:
+            return "the game refused the drop"
+        return None
+
+    def click(self, x, y):
+        return self.step(["tick", 1.0]) or self.step(["press", x, y]) or self.step(["release", x, y])
+
+    def point_on(self, card):
+        """ A point where a press picks this card, not one drawn over it. None if it is covered. """
+        y = card.top - 2
+        while y > card.bottom:
+            cards = arcade.get_sprites_at_point((card.center_x, y), self.window.card_list)
+            if cards and cards[-1] is card:
+                return card.center_x, y
+            y -= 4
+        return None
+
+    def minimize(self, seed, events, failure):
+        """ Delta debugging: drop chunks of events for as long as the same invariant still breaks """
+        kind = failure.split(":")[0]
+        chunks = 2
+        while len(events) >= 2:
+            size = -(-len(events) // chunks)
+            for start in range(0, len(events), size):
+                candidate = events[:start] + events[start + size:]
+                applied, candidate_failure = self.run(seed, candidate)
+                if candidate_failure is not None and candidate_failure.split(":")[0] == kind:
+                    events, failure = applied, candidate_failure
+                    chunks = max(chunks - 1, 2)
+                    break
+            else:
+                if chunks >= len(events):
+                    break
+                chunks = min(len(events), chunks * 2)
+        return events, failure
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="how many seeds to fuzz")
+    parser.add_argument("--events", type=int, default=10000, help="events per run")
+    parser.add_argument("--seed", type=int, default=0, help="first seed, each run uses the next one")
+    parser.add_argument("--draw-every", type=int, default=0, help="also call on_draw every N events (0 never)")
+    parser.add_argument("--replay", metavar="JSON", help="replay a failure printed by an earlier run")
+    args = parser.parse_args()
+
+    fuzz = FuzzRun(args.draw_every)
+
+    if args.replay:
+        case = json.loads(args.replay)
+        applied, failure = fuzz.run(case["seed"], case["events"])
+        print(f"seed {case['seed']}: {failure or 'no failure'} after {len(applied)} events")
+        return
+
+    failures = 0
+    total_events = 0
+    elapsed = 0.0
+    for seed in range(args.seed, args.seed + args.runs):
+        started = time.perf_counter()
+        applied, failure = fuzz.run(seed, args.events)
+        elapsed += time.perf_counter() - started
+        total_events += len(applied)
+        if failure is None:
+            continue
+        failures += 1
+        events, failure = fuzz.minimize(seed, applied, failure)
+        print(f"seed {seed}: {failure}, minimized to {len(events)} events:")
+        print(json.dumps({"seed": seed, "events": events}))
+
+    print(f"{args.runs} runs, {failures} failed, {total_events} events in {elapsed:.1f}s "
+          f"({total_events / elapsed:.0f} events per second)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import multiprocessing
+import os
+import threading
+import time
+
+import solver
+from card import CARD_SUITS, CARD_VALUES
+
+# Search budget of the first round, each round after that looks at twice as many positions up to MOST_NODES.
+# All the rounds for one position take at most about a second of CPU and 10 MB
+FIRST_ROUND_NODES = 2000
+MOST_NODES = 8000
+
+# how much lower than the game the search process runs, where the OS supports it
+SEARCH_NICENESS = 10
+
+
+def describe_move(move):
+    """ Hint text for a solver move """
+    source, destination, card_id = move
+    if card_id is None:
+        return "draw from the stock" if source == solver.STOCK_PILE else "turn the talon over"
+    card = f"{CARD_VALUES[card_id % len(CARD_VALUES)]} of {CARD_SUITS[card_id // len(CARD_VALUES)]}"
+    if destination == solver.FOUNDATION_PILE:
+        return f"{card} to the foundation"
+    return f"{card} to tableau {destination - solver.TABLEAU_PILE_1 + 1}"
+
+
+def hint_texts(position, draw_count, cancel):
+    """ Hint texts for position, each better than the one before, until the search ends or cancel is set """
+    if solver.is_won(position):
+        return
+
+    options = solver.legal_moves(position, draw_count)
+    if not options:
+        yield "No moves left"
+        return
+    # the most promising move until a search finds better
+    yield f"Hint: {describe_move(options[0][0])}?"
+
+    node_limit = FIRST_ROUND_NODES
+    while node_limit <= MOST_NODES and not cancel.is_set():
+        result, moves, nodes = solver.solve(position, draw_count, node_limit, cancel)
+        if result == solver.WON:
+            yield f"Hint: {describe_move(moves[0])}"
+            return
+        if result == solver.LOST:
+            yield "No moves left: this game can't be won"
+            return
+        node_limit *= 2
+
+
+class Superseded:
+    """ The cancel flag solver.solve checks, in the search process: set once the game asked for another search """
+
+    def __init__(self, current_search, search_number):
+        self.current_search = current_search
+        self.search_number = search_number
+
+    def is_set(self):
+        return self.current_search.value != self.search_number
+
+
+def search_positions(requests, results, current_search, search_cpu):
+    """ Body of the search process: analyse each requested position, sending its hint texts back """
+    if hasattr(os, "nice"):
+        # the game's own frames come first
+        os.nice(SEARCH_NICENESS)
+    while True:
+        search_number, position, draw_count = requests.get()
+        cancel = Superseded(current_search, search_number)
+        if cancel.is_set():
+            # a newer position is already waiting
+            continue
+        for text in hint_texts(position, draw_count, cancel):
+            results.put((search_number, text))
+            search_cpu.value = time.process_time()
+        search_cpu.value = time.process_time()
+
+
+class HintWorker:
+    """ Looks for the best next move in a separate process while the player thinks.
+
+    The solver is pure Python, so on a thread it would hold the GIL against the UI. analyse() cancels the search
+    that is running and sends the new position to the search process, which is started the first time. Each
+    search runs rounds with a growing node budget, so the longer the player leaves the table alone the deeper it
+    looks. A thread waits for the texts coming back and publishes them.
+    """
+
+    def __init__(self, on_update=None):
+        # called from the listening thread whenever text changes
+        self.on_update = on_update
+        self.text = ""
+        # (position, draw count) being analysed
+        self.analysing = None
+        self.cancel_event = None
+        # numbers searches so texts from an older one can be told apart
+        self.search_number = 0
+        # keeps a cancelled search from publishing after the next one started
+        self.lock = threading.Lock()
+        self.process = None
+
+    def start_process(self):
+        # spawn, the search process doesn't need any of the game's state, threads or OpenGL context
+        context = multiprocessing.get_context("spawn")
+        # a Queue hands the position to a feeder thread, so the UI never waits on the pipe
+        self.requests = context.Queue()
+        self.results = context.SimpleQueue()
+        # number of the search the process should be running, 0 for none
+        self.current_search = context.RawValue("q", 0)
+        # CPU seconds the process has used, as of its last hint
+        self.search_cpu = context.RawValue("d", 0.0)
+        self.process = context.Process(target=search_positions, args=(self.requests, self.results,
+                                                                        self.current_search, self.search_cpu),
+                                       name="hint-search", daemon=True)
+        self.process.start()
+        threading.Thread(target=self.listen, name="hint-listener", daemon=True).start()
+
+    def analyse(self, position, draw_count):
+        """ Start analysing position, unless it is the one already being analysed """
+        if (position, draw_count) == self.analysing:
+            return
+        self.cancel()
+        if self.process is None:
+            self.start_process()
+        with self.lock:
+            self.search_number += 1
+            self.analysing = (position, draw_count)
+            self.cancel_event = threading.Event()
+            self.set_text("Hint: thinking...")
+            self.current_search.value = self.search_number
+            self.requests.put((self.search_number, position, draw_count))
+
+    def cancel(self):
+        """ Stop the running search, it notices within a few hundred positions """
+        with self.lock:
+            if self.cancel_event is not None:
+                self.cancel_event.set()
+            self.cancel_event = None
+            self.analysing = None
+            if self.process is not None:
+                self.current_search.value = 0
+            self.set_text("")
+
+    def search_cpu_time(self):
+        """ CPU seconds the search process has used, it isn't counted in the game's own process time """
+        return self.search_cpu.value if self.process is not None else 0.0
+
+    def listen(self):
+        while True:
+            search_number, text = self.results.get()
+            self.publish(text, search_number)
+
+    def publish(self, text, search_number):
+        # a cancelled search must not write over the hint for the position that replaced it
+        with self.lock:
+            if search_number == self.search_number and self.cancel_event is not None \
+                    and not self.cancel_event.is_set():
+                self.set_text(text)
+
+    def set_text(self, text):
+        self.text = text
+        if self.on_update is not None:
+            self.on_update()
@@ -0,0 +1,60 @@
+import mmap  # data files are read straight from disk, never loaded whole
+import os
+import struct
+
+
+class MappedFile:
+    """ A read-only data file built offline, mapped into memory and checked before anything reads it.
+
+    Subclasses set MAGIC and read their header in read_header(), calling need() before each unpack so a short
+    file raises ValueError instead of struct.error.
+    """
+
+    MAGIC = b""
+
+    def __init__(self, file):
+        self.file = file
+        self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.need(len(self.MAGIC))
+        if self.data[:len(self.MAGIC)] != self.MAGIC:
+            raise ValueError(f"{file.name} is not a {type(self).__name__} file")
+        self.read_header()
+
+    def read_header(self):
+        pass
+
+    def need(self, size):
+        """ Raise ValueError if the file is shorter than size bytes """
+        if len(self.data) < size:
+            raise ValueError(f"{self.file.name} is truncated")
+
+    def unpack(self, struct_format, offset):
+        """ struct.unpack_from on the file, after checking the bytes are there """
+        self.need(offset + struct.calcsize(struct_format))
+        return struct.unpack_from(struct_format, self.data, offset)
+
+    @classmethod
+    def open(cls, path):
+        """ Open the file at path, or return None if it hasn't been built or is broken """
+        if not os.path.exists(path):
+            return None
+        file = open(path, "rb")
+        try:
+            return cls(file)
+        except ValueError:
+            # empty or half written, e.g. by a build that was stopped. mmap raises ValueError for an empty file too
+            file.close()
+            return None
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+
+def write_atomically(path, chunks):
+    """ Write chunks of bytes to path through a temporary file, so a running game never maps a half written file """
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as file:
+        for chunk in chunks:
+            file.write(chunk)
+    os.replace(temp_path, path)
@@ -0,0 +1,97 @@
+""" Render Solitaire boards to PNG files or pixel buffers without a window on screen.
+
+Runs arcade headless (an offscreen OpenGL context), so it works on machines with no display.
+Boards are drawn by the game's own on_draw, so a snapshot looks exactly like the game. Batches are spread over
+worker processes, each drawing on its own offscreen window.
+
+    python snapshot.py --seeds 0 999 --out snapshots
+"""
+import os
+
+# Has to be set before arcade is imported anywhere
+os.environ.setdefault("ARCADE_HEADLESS", "1")
+
+import argparse
+import multiprocessing
+import time
+
+import PIL.Image
+
+from solitaire import Solitaire
+
+# zlib's fastest level, most of the time of a snapshot goes to compressing it otherwise
+PNG_COMPRESS_LEVEL = 1
+
+# the window a worker process draws on, made by start_worker
+worker_window = None
+
+
+def render_board(window):
+    """ Draw the window's current game and return it as a PIL image """
+    window.request_redraw()
+    window.on_draw()
+    # read the framebuffer straight into an image, the raw decoder turns OpenGL's bottom-up rows over as it copies
+    pixels = window.ctx.screen.read(viewport=(0, 0, window.width, window.height), components=4)
+    return PIL.Image.frombuffer("RGBA", (window.width, window.height), pixels, "raw", "RGBA", 0, -1)
+
+
+def render_pixels(window):
+    """ Draw the window's current game and return its RGBA pixels, row by row from the top """
+    return render_board(window).tobytes()
+
+
+def save_board(window, path):
+    """ Draw the window's current game to a PNG file """
+    # the table is opaque, so the alpha channel would only make the file bigger
+    render_board(window).convert("RGB").save(path, "PNG", compress_level=PNG_COMPRESS_LEVEL)
+
+
+def make_window(theme, vegas):
+    """ A window set up to draw snapshots with the given theme index and mode """
+    window = Solitaire()
+    # the hint depends on how far the background search got, so leave it out of snapshots
+    window.show_hints = False
+    window.current_theme_index = theme % len(window.theme_setting)
+    window.set_theme()
+    window.game_mode_flag = not vegas
+    return window
+
+
+def start_worker(theme, vegas):
+    global worker_window
+    worker_window = make_window(theme, vegas)
+
+
+def save_deal(job):
+    """ Render the deal for a seed to a PNG file in the worker's window """
+    seed, out = job
+    worker_window.new_game_setup(seed)
+    save_board(worker_window, os.path.join(out, f"deal_{seed}.png"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seeds", type=int, nargs=2, default=(0, 0), metavar=("FIRST", "LAST"),
+                        help="render the deals for every seed from FIRST to LAST")
+    parser.add_argument("--theme", type=int, default=0, help="theme index to render with")
+    parser.add_argument("--vegas", action="store_true", help="render in Vegas mode")
+    parser.add_argument("--out", default="snapshots", help="folder to write the PNG files to")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="processes to render with")
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+
+    first, last = args.seeds
+    started = time.perf_counter()
+    # each worker reuses one window for all of its boards
+    with multiprocessing.Pool(args.workers, initializer=start_worker, initargs=(args.theme, args.vegas)) as pool:
+        for _ in pool.imap_unordered(save_deal, ((seed, args.out) for seed in range(first, last + 1)), chunksize=8):
+            pass
+    elapsed = time.perf_counter() - started
+
+    count = last - first + 1
+    print(f"Rendered {count} boards in {elapsed:.1f}s with {args.workers} workers ({60 * count / elapsed:.0f} per minute)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,42 @@
 from typing import Optional
 
+import argparse
 import arcade
 import random  # for shuffling cards
 import time  # for tracking time span when double-clicking a card
 
-from card import Card
+from card import Card, CARD_SUITS, CARD_VALUES, shuffle_card_ids
+from deal_library import DealLibrary, DIFFICULTY_BANDS
+from telemetry import TelemetryWriter
+from hints import HintWorker
+from solver import position_from_piles
+from theme_pack import ThemePack, scale_photo
 
 
 
 
 class Solitaire(arcade.Window):
 
-    def __init__(self):
+    def __init__(self, render_on_demand=True, telemetry=None, show_hints=True):
+        # TelemetryWriter that gameplay events go to, None when telemetry is off
+        self.telemetry = telemetry
+        # when the held cards were picked up, to time moves
+        self.held_since = None
+
+        # only redraw when something changed, otherwise on_draw keeps the last frame on screen
+        self.render_on_demand = render_on_demand
+        self.frame_dirty = True
+        # frame counts for --frame-stats
+        self.frames_drawn = 0
+        self.frames_skipped = 0
+
         super().__init__(WINDOW_WIDTH, WINDOW_HEIGHT, SCREEN_TITLE)
         # initialize score
         self.score = -52
         # winning status
         self.winning_status  = False
 
-        # all theme setting
+        # all theme setting, photos are only loaded the first time their theme is picked
         # padoru mode for matthew{"background": arcade.load_texture("C:/Users/matth/Downloads/artworks-000672876424-5wl11j-t500x500.jpg"),
         #  "text": arcade.color.BLUE,
         #  "mat": (128, 0, 128, 128), "title": "Padoru Padoru",
@@ -26,16 +44,19 @@ class Solitaire(arcade.Window):
         self.theme_setting = [
             {"text": arcade.color.WHITE,
              "mat": (143, 188, 143, 200), "title": "plain"},
-            {"background": arcade.load_texture("theme_photos/CanadaDay.jpg"), "text": arcade.color.RED,
+            {"image": "theme_photos/CanadaDay.jpg", "text": arcade.color.RED,
              "mat": (255, 0, 0, 128), "title": "Canada Day", "reference": "Red Maple Leaves on White Background, by Anna Nekrashevich,url: https://www.pexels.com/photo/red-maple-leaves-on-white-background-7144752/"},
-            {"background": arcade.load_texture("theme_photos/Christmas.jpg"), "text": arcade.color.ROSE,
+            {"image": "theme_photos/Christmas.jpg", "text": arcade.color.ROSE,
              "mat": (255, 0, 127, 128), "title": "Christmas", "reference": "Christmas Board Decors, by George Dolgikh, url: https://www.pexels.com/photo/christmas-board-decors-1303098/"},
-            {"background": arcade.load_texture("theme_photos/Halloween.jpg"), "text": arcade.color.ORANGE,
+            {"image": "theme_photos/Halloween.jpg", "text": arcade.color.ORANGE,
              "mat": (255, 165, 0, 128), "title": "Halloween", "reference": "Pumpkin and Skull on Table, by Chokniti Khongchum, url: https://www.pexels.com/photo/pumpkin-and-skull-on-table-2679968/"},
-            {"background": arcade.load_texture("theme_photos/NewYear.jpg"), "text": arcade.color.WHITE,
+            {"image": "theme_photos/NewYear.jpg", "text": arcade.color.WHITE,
              "mat": (128, 0, 128, 128), "title": "New Year", "reference": "Purple Fireworks Display, by Baluc Photography, url: https://www.pexels.com/photo/purple-fireworks-display-6598294/"},
         ]
 
+        # theme photos already scaled to the window, None until build_themes.py has been run
+        self.theme_pack = ThemePack.open_for_window(THEME_PACK_FILE, self.width, self.height)
+
         # current theme
         self.current_theme_index = 0
         self.set_theme()
@@ -48,18 +69,20 @@ class Solitaire(arcade.Window):
         # This cards that we want to drag
         self.held_cards = None
 
-        # This sets an original location so that a card can go back to
-        self.held_cards_original_position = None
-
         # Sprite list with all the mats that cards lay on.
         self.pile_mat_list = None
 
         # List of lists, each holds a pile of cards.
         self.piles = None
 
+        # Piles whose card positions are out of date: pile index -> first card index to lay out again
+        self.dirty_piles = {}
+
         # for tracking double clicking condition
         self.click_count = 0
         self.threshold_to_meet = 0
+        # clock the double click timing reads, fuzz.py swaps in its own
+        self.clock = time.time
 
         # Flag to determine game mode (True for Classic, False for Vegas)
         self.game_mode_flag = True
@@ -74,6 +97,18 @@ class Solitaire(arcade.Window):
 
         self.cumulative_option_txt = ""
 
+        # winnable deals only: None when off, otherwise the difficulty band the deals are picked from
+        self.deal_library = DealLibrary.open(DEAL_LIBRARY_FILE)
+        self.deal_difficulty = None
+
+        # seed of the current deal
+        self.deal_seed = None
+
+        # best next move, worked out in the background while the player thinks. The search process only starts
+        # the first time hints are on
+        self.show_hints = show_hints
+        self.hint_worker = HintWorker(on_update=self.request_redraw)
+
     def set_theme(self):
 
         theme = self.theme_setting[self.current_theme_index]
@@ -84,21 +119,29 @@ class Solitaire(arcade.Window):
         self.title = theme["title"]
         if self.title != "plain":
             self.reference = theme["reference"]
-            self.background = theme["background"]
+            self.background = self.load_background(theme)
+
+    def load_background(self, theme):
+        """ Load a theme photo once, already scaled to the window so on_draw doesn't resize it every frame """
+        if "background" not in theme:
+            image = self.theme_pack.image(theme["image"]) if self.theme_pack is not None else None
+            if image is None:
+                # no pack built for this window size, decode the photo itself
+                image = scale_photo(theme["image"], self.width, self.height)
+            theme["background"] = arcade.Texture(f"{theme['image']}-{self.width}x{self.height}", image=image,
+                                                 hit_box_algorithm="None")
+        return theme["background"]
 
 
 
 
-    def new_game_setup(self):
-        """ Set up the game here. Call this function to restart the game. """
+    def new_game_setup(self, seed=None):
+        """ Set up the game here. Call this function to restart the game. A seed replays that exact deal. """
 
         # Cards that we are dragging
         # self.held_cards = [0]
         self.held_cards = []
 
-        # This is the original location of a card we are moving
-        self.held_cards_original_position = []
-
         # ---  Create the mats the cards go on.
 
         # Sprite list with all the mats tha cards lay on.
@@ -140,17 +183,13 @@ class Solitaire(arcade.Window):
         # Sprite list.
         self.card_list = arcade.SpriteList()
 
-        # Create every card
-        for card_suit in CARD_SUITS:
-            for card_value in CARD_VALUES:
-                card = Card(card_suit, card_value, CARD_SCALE)
-                card.position = LEFT_X, TOP_Y
-                self.card_list.append(card)
+        # pick the deal, from the winnable deal library when that option is on
+        self.deal_seed = self.pick_deal_seed() if seed is None else seed
 
-        # shuffle the cards
-        for pos1 in range(len(self.card_list)):
-            pos2 = random.randrange(len(self.card_list))
-            self.card_list.swap(pos1, pos2)
+        # Create every card, already shuffled
+        for card_id in shuffle_card_ids(self.deal_seed):
+            card = Card(CARD_SUITS[card_id // len(CARD_VALUES)], CARD_VALUES[card_id % len(CARD_VALUES)], CARD_SCALE)
+            self.card_list.append(card)
 
         # Array of lists
         self.piles = [[] for _ in range(PILE_COUNT)]
@@ -167,8 +206,6 @@ class Solitaire(arcade.Window):
                 card = self.piles[STOCK_PILE].pop()
                 # Put in the foundation pile
                 self.piles[pile_no].append(card)
-                # move the card to the pile we just created
-                card.position = self.pile_mat_list[pile_no].position
                 # put on top
                 self.pull_to_top(card)
 
@@ -176,8 +213,52 @@ class Solitaire(arcade.Window):
         for i in range(TABLEAU_PILE_1, TABLEAU_PILE_7 + 1):
             self.piles[i][-1].face_up()
 
+        # Lay out every pile from scratch
+        for pile_index in range(PILE_COUNT):
+            self.mark_pile_dirty(pile_index)
+        self.layout_piles()
+
+        self.record("deal", seed=self.deal_seed, classic=self.game_mode_flag, draw3=self.draw3_option,
+                    score=self.score)
+        self.update_hint()
+
+    def update_hint(self):
+        """ Restart the hint search when the cards or the draw mode changed, the UI never waits on it """
+        if self.show_hints and not self.winning_status:
+            self.hint_worker.analyse(position_from_piles(self.piles), 3 if self.is_talon_fanned() else 1)
+        else:
+            self.hint_worker.cancel()
+
+    def pick_deal_seed(self):
+        """ A seed from the deal library when winnable deals only is on, otherwise a fresh random one """
+        if self.deal_library is not None and self.deal_difficulty is not None:
+            draw_count = 3 if self.is_talon_fanned() else 1
+            seed = self.deal_library.random_seed(draw_count, self.deal_difficulty)
+            if seed is not None:
+                return seed
+        return random.getrandbits(32)
+
+    def record(self, event, **fields):
+        """ Send a gameplay event to telemetry, if it's on """
+        if self.telemetry is not None:
+            self.telemetry.emit(event, **fields)
+
+    def request_redraw(self):
+        """ Something on screen changed, draw it on the next frame """
+        self.frame_dirty = True
+
     def on_draw(self):
         """ Render the screen. """
+        if self.render_on_demand and not self.frame_dirty:
+            # Nothing changed: don't draw, and have flip() leave the last frame on screen
+            self.static_display = True
+            self.flip_count = 1
+            self.frames_skipped += 1
+            return
+        self.frame_dirty = False
+        self.static_display = False
+        self.frames_drawn += 1
+
         # Clear the screen
         self.clear()
 
@@ -187,8 +268,6 @@ class Solitaire(arcade.Window):
                 self.width, self.height, self.background
             )
 
-        # Set mat colors
-        self.set_mat_color()
         # Draw the mats the cards go on top
         self.pile_mat_list.draw()
 
@@ -213,6 +292,56 @@ class Solitaire(arcade.Window):
             pile.position = self.pile_mat_list[i].position
             self.pile_mat_list[i] = pile  # replace previous mat
 
+    def mark_pile_dirty(self, pile_index, first_index=0):
+        """ Flag a pile so its cards from first_index up are laid out again by layout_piles """
+        self.dirty_piles[pile_index] = min(first_index, self.dirty_piles.get(pile_index, first_index))
+
+    def is_talon_fanned(self):
+        """ Draw 3 in Vegas mode fans the top 3 cards of the Talon Pile downwards """
+        return self.game_mode_flag is False and self.draw3_option is True
+
+    def layout_piles(self):
+        """ Put the cards of every dirty pile in their slots, leaving the other piles alone """
+        for pile_index, first_index in self.dirty_piles.items():
+            self.layout_pile(pile_index, first_index)
+        self.dirty_piles = {}
+        if self.held_cards:
+            # the held cards were skipped, their pile puts them back in their slots if they are dropped nowhere
+            held_pile = self.get_pile_for_card(self.held_cards[0])
+            self.mark_pile_dirty(held_pile, self.piles[held_pile].index(self.held_cards[0]))
+
+    def layout_pile(self, pile_index, first_index):
+        """ Work out the slot of each card from first_index up, then write them all back in one pass """
+        pile = self.piles[pile_index]
+        mat_x, mat_y = self.pile_mat_list[pile_index].position
+        first_index = min(first_index, len(pile))
+        positions = []
+
+        if TABLEAU_PILE_1 <= pile_index <= TABLEAU_PILE_7:
+            # face down cards are stacked on the mat, face up cards fan down from the card under them
+            y = mat_y if first_index == 0 else pile[first_index - 1].center_y
+            for card_index in range(first_index, len(pile)):
+                if card_index > 0 and pile[card_index - 1].is_face_up:
+                    y -= CARD_VERTICAL_OFFSET
+                positions.append((mat_x, y))
+
+        elif pile_index == TALON_PILE and self.is_talon_fanned():
+            # a card joining or leaving shifts the 3 cards under it in or out of the fan
+            fan_start = max(0, len(pile) - 3)
+            first_index = max(0, first_index - 3)
+            for card_index in range(first_index, len(pile)):
+                fan_slot = max(0, card_index - fan_start)
+                positions.append((mat_x, mat_y - fan_slot * (CARD_VERTICAL_OFFSET + 10)))
+
+        else:
+            # Stock, Foundation and a stacked Talon keep every card on the mat
+            positions = [(mat_x, mat_y)] * (len(pile) - first_index)
+
+        for card, position in zip(pile[first_index:], positions):
+            # cards being dragged follow the mouse until they are dropped
+            if card not in self.held_cards:
+                card.position = position
+
     def pull_to_top(self, card: arcade.Sprite):
 
         # remove and append to the end
@@ -222,7 +351,10 @@ class Solitaire(arcade.Window):
     def on_mouse_press(self, x, y, button, key_modifiers):
         """ Called when User presses the mouse button """
 
-        first_clicked = time.time() % 60  # converts to seconds in minute, than seconds in day
+        # raw clock time, seconds in the minute would wrap and make clicks a minute apart look like a double click
+        first_clicked = self.clock()
+
+        self.request_redraw()
 
         # get cards that were clicked
         cards = arcade.get_sprites_at_point((x, y), self.card_list)
@@ -245,7 +377,9 @@ class Solitaire(arcade.Window):
                 self.click_count += 1  # increment click count again
                 if self.click_count == 2:
                     if primary_card == self.piles[pile_index][-1]:  # Check if the double-clicked card is the top card in the pile
-                        self.move_card_to_foundation(primary_card)  # Sends card to the location
+                        if self.move_card_to_foundation(primary_card):  # Sends card to the location
+                            self.record("move", card=primary_card.card_id, source=pile_index,
+                                        target=self.get_pile_for_card(primary_card), count=1, double_click=True)
                         if self.game_mode_flag is False and self.draw3_option is True:
                             self.show_talon_cards()
                     self.click_count = 0  # reset the count
@@ -272,8 +406,7 @@ class Solitaire(arcade.Window):
             elif pile_index != TALON_PILE or self.game_mode_flag:
                 # All other cases, grab the face-up card
                 self.held_cards = [primary_card]
-                # Save the position
-                self.held_cards_original_position = [self.held_cards[0].position]
+                self.held_since = time.monotonic()
                 # Put on top of Stock
                 self.pull_to_top(self.held_cards[0])
 
@@ -285,15 +418,14 @@ class Solitaire(arcade.Window):
                     for i in range(card_index + 1, len(self.piles[pile_index])):
                         card = self.piles[pile_index][i]
                         self.held_cards.append(card)
-                        self.held_cards_original_position.append(card.position)
                         self.pull_to_top(card)
             # Vegas rule
             else:
-                if primary_card == self.piles[pile_index][-1]:
+                # a double click may have just sent the last talon card to the foundation
+                if self.piles[pile_index] and primary_card == self.piles[pile_index][-1]:
                     # All other cases, grab the face-up card
                     self.held_cards = [primary_card]
-                    # Save the position
-                    self.held_cards_original_position = [self.held_cards[0].position]
+                    self.held_since = time.monotonic()
                     # Put on top of Stock
                     self.pull_to_top(self.held_cards[0])
 
@@ -307,54 +439,27 @@ class Solitaire(arcade.Window):
                 while self.piles[TALON_PILE]:
                     card = self.piles[TALON_PILE].pop()
                     card.face_down()
-                    card.position = self.pile_mat_list[STOCK_PILE].position
                     self.piles[STOCK_PILE].append(card)
+                self.mark_pile_dirty(STOCK_PILE)
+                self.mark_pile_dirty(TALON_PILE)
+                self.record("recycle", count=len(self.piles[STOCK_PILE]))
 
-
-
-
-        ## If cards are not found
-        else:
-
-            # You didn't click on a card
-            mats = arcade.get_sprites_at_point((x, y), self.pile_mat_list)
-
-            if len(mats) > 0:
-                mat = mats[0]
-                mat_index = self.pile_mat_list.index(mat)
-
-                if mat_index == STOCK_PILE and len(self.piles[STOCK_PILE]) == 0:
-                    # Flip stock pile so we can restart
-                    temp_list = self.piles[STOCK_PILE].copy()
-                    for card in reversed(temp_list):
-                        card.face_down()
-                        self.piles[TALON_PILE].remove(card)
-                        self.piles[STOCK_PILE].append(card)
-                        card.position = self.pile_mat_list[STOCK_PILE].position
+        self.layout_piles()
+        self.update_hint()
 
     def get_1_talon_card(self):
         if len(self.piles[STOCK_PILE]) > 0:
             # Flip the top card from the Stock Pile to the Talon Pile
             card = self.piles[STOCK_PILE][-1]
             card.face_up()
-            card.position = self.pile_mat_list[TALON_PILE].position
-            self.piles[STOCK_PILE].remove(card)
-            self.piles[TALON_PILE].append(card)
+            self.move_card_to_new_pile(card, TALON_PILE)
             self.pull_to_top(card)
-
-            if self.game_mode_flag is False:
-                talon_pile = self.piles[TALON_PILE]
-                num_cards = len(talon_pile)
-                for i in range(num_cards):  # stack the cards
-                    card = talon_pile[i]
-                    card.position = (
-                        self.pile_mat_list[TALON_PILE].position[0],
-                        self.pile_mat_list[TALON_PILE].position[1]
-                    )
+            self.record("draw", count=1, stock=len(self.piles[STOCK_PILE]))
 
     def get_3_talon_cards(self):
         """Flip the 3 new cards"""
         if self.draw3_option is True:
+            drawn = min(3, len(self.piles[STOCK_PILE]))
             for i in range(3):
                 # If there is no more cards, stop
                 if len(self.piles[STOCK_PILE]) == 0:
@@ -366,17 +471,12 @@ class Solitaire(arcade.Window):
                 # Now flip that card
                 card.face_up()
 
-                # Position of the talon with downward shift for Vegas mode
-                card.position = (
-                    self.pile_mat_list[TALON_PILE].position[0],
-                    self.pile_mat_list[TALON_PILE].position[1] - i * (CARD_VERTICAL_OFFSET + 10)
-                )
-                # Remove the card from the stock
-                self.piles[STOCK_PILE].remove(card)
-                # Move the card to the talon
-                self.piles[TALON_PILE].append(card)
+                # Move the card from the stock to the talon, the layout fans it downwards
+                self.move_card_to_new_pile(card, TALON_PILE)
                 # Put the new cards at the top of the pile
                 self.pull_to_top(card)
+            if drawn > 0:
+                self.record("draw", count=drawn, stock=len(self.piles[STOCK_PILE]))
 
 
     def move_card_to_foundation(self, primary_card):
@@ -385,44 +485,34 @@ class Solitaire(arcade.Window):
             # The card must be face up to move to the foundation
             return False
 
-        card_suit = primary_card.get_suit()
-        card_value = primary_card.get_value()
-
         # Iterate through the foundation piles
         for pile_index in range(FOUNDATION_PILE_1, FOUNDATION_PILE_4 + 1):
             target_pile = self.piles[pile_index]  # Destination of the card
 
-
-            if card_value == 1:  # If it's an Ace
-                if len(target_pile) == 0:  # If foundation is empty
-                    primary_card.position = self.pile_mat_list[
-                        pile_index].position  # Matches the pos of card and foundation (move card to foundation)
-                    self.move_card_to_new_pile(primary_card, pile_index)
-                    if self.game_mode_flag is False and primary_card.get_was_at_foundation_once() is False:
-                        self.score += 5
-                        primary_card.set_was_at_foundation_once(True)
-                    return True  # Card successfully moved to the foundation pile
-
+            if len(target_pile) == 0:
+                # Only an Ace can start an empty foundation
+                can_move = primary_card.get_value() == 1
             else:
-                if len(target_pile) > 0:  # Foundation pile is not empty, then card can be stacked
-                    top_card = target_pile[
-                        -1]  # The card on the foundation pile to be compared to primary card for stacking
-                    if card_suit == top_card.get_suit() and (int(card_value) == int(
-                            top_card.get_value()) + 1):  # Cards' suit match and Values is in ascending order
-                        primary_card.position = self.pile_mat_list[
-                            pile_index].position  # Matches the pos of card and foundation (move card to foundation)
-                        self.move_card_to_new_pile(primary_card, pile_index)
-                        if self.game_mode_flag is False and primary_card.get_was_at_foundation_once() is False:
-                            self.score += 5
-                            primary_card.set_was_at_foundation_once(True)
-                        return True  # Card successfully moved to the foundation pile
+                # Same suit and one higher than the card on the foundation
+                can_move = primary_card.can_follow_on_foundation(target_pile[-1])
+
+            if can_move:
+                self.move_card_to_new_pile(primary_card, pile_index)
+                # drawn over the card it covers, or a click on the foundation picks up the card under it
+                self.pull_to_top(primary_card)
+                if self.game_mode_flag is False and primary_card.get_was_at_foundation_once() is False:
+                    self.score += 5
+                    primary_card.set_was_at_foundation_once(True)
+                return True  # Card successfully moved to the foundation pile
 
         return False
 
     def remove_card_from_pile(self, card):
         # remove a card from the pile that it was in
-        for pile in self.piles:
+        for pile_index, pile in enumerate(self.piles):
             if card in pile:
+                # the cards above it, if any, have to be laid out again
+                self.mark_pile_dirty(pile_index, pile.index(card))
                 pile.remove(card)
                 break
 
@@ -436,11 +526,14 @@ class Solitaire(arcade.Window):
         """Removes card from previous pile and add it to new pile target"""
         self.remove_card_from_pile(card)
         self.piles[pile_index].append(card)
+        self.mark_pile_dirty(pile_index, len(self.piles[pile_index]) - 1)
 
     def on_mouse_release(self, x: float, y: float, button: int,
                          modifiers: int):
         """ Called when the user presses a mouse button. """
 
+        self.request_redraw()
+
         # if held_cards is empty list
         if len(self.held_cards) == 0:
             # if self.held_cards[0] != 0:
@@ -451,12 +544,15 @@ class Solitaire(arcade.Window):
         pile, distance = arcade.get_closest_sprite(self.held_cards[0], self.pile_mat_list)
 
         reset_position = True
+        source_index = self.get_pile_for_card(self.held_cards[0])
+        target_index = None
 
         # See if we are in contact with the closest pile
         if arcade.check_for_collision(self.held_cards[0], pile):
             card_orignal_from = self.get_pile_for_card(self.held_cards[0])
             # Which pile is going to place to?
             pile_index = self.pile_mat_list.index(pile)
+            target_index = pile_index
 
             #  Is it the same pile we came from?
             if pile_index == self.get_pile_for_card(self.held_cards[0]):
@@ -479,31 +575,34 @@ class Solitaire(arcade.Window):
                  self.show_talon_cards()
 
 
+        held_for = round(time.monotonic() - self.held_since, 3) if self.held_since is not None else None
         if reset_position:
-            #            # Where-ever we were dropped, it wasn't valid. Reset the each card's position
-            #            # to its original spot.
-            for pile_index, card in enumerate(self.held_cards):
-                card.position = self.held_cards_original_position[pile_index]
+            # Where-ever we were dropped, it wasn't valid. Lay the held cards out again in the pile they came from
+            pile_index = self.get_pile_for_card(self.held_cards[0])
+            self.mark_pile_dirty(pile_index, self.piles[pile_index].index(self.held_cards[0]))
+            if target_index != source_index:
+                self.record("failed_drop", card=self.held_cards[0].card_id, source=source_index, target=target_index,
+                            count=len(self.held_cards), held_for=held_for)
+        else:
+            self.record("move", card=self.held_cards[0].card_id, source=source_index, target=target_index,
+                        count=len(self.held_cards), held_for=held_for, score=self.score)
 
         #        # We are no longer holding cards
         self.held_cards = []
+        self.held_since = None
+        self.layout_piles()
         self.check_winning()
+        self.update_hint()
 
     def move_to_tableau_pile(self, pile, pile_index, reset_position):
         # if pile is not empty
         if len(self.piles[pile_index]) > 0:
             top_card = self.piles[pile_index][-1]
-            primary_color = self.held_cards[0].get_color()
-            top_color = top_card.get_color()
-            primary_value = int(self.held_cards[0].get_value())
-            top_value = int(top_card.get_value())
-
-            # if the primary card is the opposite color of the top card and the primary card is one less than the top card
-            if primary_color != top_color and primary_value == top_value - 1:
-                for i, dropped_card in enumerate(self.held_cards):
-                    dropped_card.position = top_card.center_x, top_card.center_y - CARD_VERTICAL_OFFSET * (
-                            i + 1)
-                # Cards are in the right position, but we need to move them to the right list
+
+            # if the top card is face up, the primary card is the opposite color of the top card and the primary card is
+            # one less than the top card
+            if top_card.is_face_up and self.held_cards[0].can_stack_on_tableau(top_card):
+                # Move them to the right list, the layout fans them down from the top card
                 for card in self.held_cards:
                     self.move_card_to_new_pile(card, pile_index)
 
@@ -520,46 +619,23 @@ class Solitaire(arcade.Window):
     def move_to_foundation_pile(self, pile, pile_index, reset_position, target_pile):
         if len(target_pile) == 0:
             # If the target pile is empty, only Ace (A) can be moved to an empty pile
-            if self.held_cards[0].get_value() == 1:
-                # Check if the card's suit matches the foundation pile's suit
-                target_suit = target_pile[0].get_suit() if len(target_pile) > 0 else None
-                held_suit = self.held_cards[0].get_suit()
-                if target_suit is None or target_suit == held_suit:
-                    # Move the card to the foundation pile
-                    self.held_cards[0].position = pile.position
-                    for card in self.held_cards:
-                        self.move_card_to_new_pile(card, pile_index)
-                    reset_position = False
-                    if self.game_mode_flag is False and self.held_cards[0].get_was_at_foundation_once() is False:
-                        self.score += 5
-                        self.held_cards[0].set_was_at_foundation_once(True)
-
-
-
+            can_move = self.held_cards[0].get_value() == 1
         else:
-            # If the target pile is not empty, check if the card's value is one greater than the top card's value
-            top_card = target_pile[-1]
-            primary_value = self.held_cards[0].get_value()
-            top_value = top_card.get_value()
-            if primary_value == top_value + 1:
-                # Check if the card's suit matches the foundation pile's suit
-                target_suit = top_card.get_suit()
-                held_suit = self.held_cards[0].get_suit()
-                if target_suit == held_suit:
-                    # Move the card to the foundation pile
-                    self.held_cards[0].position = pile.position
-                    for card in self.held_cards:
-                        self.move_card_to_new_pile(card, pile_index)
-                    reset_position = False
-                    if self.game_mode_flag is False and self.held_cards[0].get_was_at_foundation_once() is False:
-                        self.score += 5
-                        self.held_cards[0].set_was_at_foundation_once(True)
+            # If the target pile is not empty, the card must be the same suit and one greater than the top card
+            can_move = self.held_cards[0].can_follow_on_foundation(target_pile[-1])
+
+        if can_move:
+            # Move the card to the foundation pile
+            for card in self.held_cards:
+                self.move_card_to_new_pile(card, pile_index)
+            reset_position = False
+            if self.game_mode_flag is False and self.held_cards[0].get_was_at_foundation_once() is False:
+                self.score += 5
+                self.held_cards[0].set_was_at_foundation_once(True)
         return reset_position
 
     def move_to_empty_pile(self, pile, pile_index, reset_position):
         if self.held_cards[0].get_value() == 13:
-            for i, dropped_card in enumerate(self.held_cards):
-                dropped_card.position = pile.center_x, pile.center_y - CARD_VERTICAL_OFFSET * i
             for card in self.held_cards:
                 self.move_card_to_new_pile(card, pile_index)
             reset_position = False
@@ -570,13 +646,27 @@ class Solitaire(arcade.Window):
 
         # If a card is clicked, then move it along the mouse
         # if self.held_cards != [0]:
-        if self.held_cards != [0]:
+        if self.held_cards:
             for card in self.held_cards:
                 card.center_x += dx
                 card.center_y += dy
+            self.request_redraw()
+
+    def on_resize(self, width: float, height: float):
+        super().on_resize(width, height)
+        self.request_redraw()
+
+    def on_expose(self):
+        """ The window was uncovered, so the last frame may be gone """
+        self.request_redraw()
 
     def on_key_press(self, symbol: int, modifiers: int):
         """ User presses key """
+        # every key either changes the game, the options or the theme
+        self.request_redraw()
+        # cleared when the key did nothing, so telemetry only sees toggles that happened
+        handled = True
+
         if symbol == arcade.key.R:
             # Restart
             if self.cumulative_option is True and self.game_mode_flag is False:  # activate cumulative_option
@@ -598,13 +688,16 @@ class Solitaire(arcade.Window):
                 self.score = -52 #resets the score is C is not on and in vegas mode
             if self.winning_status:
                 self.winning_status = False
-            self.new_game_setup()
+            # switch first, the new deal is picked for the draw count of the mode being switched to
             self.game_mode_flag = not self.game_mode_flag
+            self.new_game_setup()
         elif symbol == arcade.key.O and self.game_mode_flag is False: #should be in vegas mode
             if self.draw3_option is False: #activate draw3_option
                 self.draw3_option = True
             else: #deactivate draw3_option
                 self.draw3_option = False
+            # the talon switches between fanned and stacked
+            self.mark_pile_dirty(TALON_PILE)
         elif symbol == arcade.key.C and self.game_mode_flag is False: #should be in vegas mode
             if self.cumulative_option is False: #activate cumulative_option
                 self.cumulative_option = True
@@ -631,10 +724,30 @@ class Solitaire(arcade.Window):
             self.cumulative_option_txt = ""
             self.draw3_option_txt = ""
             self.new_game_setup()
+        elif symbol == arcade.key.D and self.deal_library is not None:
+            # cycle winnable deals only: off, then each difficulty band, then off again
+            bands = [None] + list(DIFFICULTY_BANDS)
+            self.deal_difficulty = bands[(bands.index(self.deal_difficulty) + 1) % len(bands)]
+        elif symbol == arcade.key.H:
+            # hints on/off
+            self.show_hints = not self.show_hints
         elif symbol == arcade.key.T:
             # switch theme
             self.current_theme_index = (self.current_theme_index + 1) % len(self.theme_setting)
             self.set_theme()
+            # Set mat colors
+            self.set_mat_color()
+        else:
+            handled = False
+
+        if handled:
+            # mode, option and theme changes
+            self.record("key", key=chr(symbol).upper(), classic=self.game_mode_flag, draw3=self.draw3_option,
+                        cumulative=self.cumulative_option, winnable=self.deal_difficulty, theme=self.title,
+                        hints=self.show_hints)
+
+        self.layout_piles()
+        self.update_hint()
 
 
 
@@ -651,10 +764,6 @@ class Solitaire(arcade.Window):
                 card = talon_pile[-1 - i]  # Get the topmost card
                 # print(card.get_value(), card.get_suit())
                 card.face_up()  # Make sure the card is face up
-                card.position = (
-                    self.pile_mat_list[TALON_PILE].center_x,
-                    self.pile_mat_list[TALON_PILE].center_y + (i - 2) * (CARD_VERTICAL_OFFSET + 10)
-                )
 
                 # Ensure the card is in the card list and on top
                 self.pull_to_top(card)
@@ -667,6 +776,8 @@ class Solitaire(arcade.Window):
                 return
 
         #otherwise, keep playing
+        if self.winning_status is False:
+            self.record("win", seed=self.deal_seed, classic=self.game_mode_flag, score=self.score)
         self.winning_status = True
 
     def display_win_score(self):
@@ -680,6 +791,11 @@ class Solitaire(arcade.Window):
             arcade.draw_text(f"Your Current Score: {self.score}", WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 - 150,
                              self.text_color, 18, anchor_x="center")
 
+        # hint from the background search, between the tableau and the legend
+        if self.show_hints and self.winning_status is False and self.hint_worker.text:
+            arcade.draw_text(self.hint_worker.text, WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 - 40,
+                             self.text_color, 14, anchor_x="center")
+
     def display_theme_title(self):
 
         if self.game_mode_flag:
@@ -696,7 +812,12 @@ class Solitaire(arcade.Window):
                 self.cumulative_option_txt = ""
 
 
-        arcade.draw_text( f"{self.cumulative_option_txt}", 5, 75, self.text_color, 25,
+        if self.deal_difficulty is not None:
+            self.deal_difficulty_txt = f"Winnable deals: {self.deal_difficulty}"
+        else:
+            self.deal_difficulty_txt = ""
+
+        arcade.draw_text( f"{self.cumulative_option_txt} {self.deal_difficulty_txt}", 5, 75, self.text_color, 25,
                          anchor_x="left")
         arcade.draw_text( f"Theme: {self.title}, Game Mode: {self.game_mode_flag_txt} {self.draw3_option_txt}", 5, 40, self.text_color, 25,
                          anchor_x="left")
@@ -711,7 +832,9 @@ class Solitaire(arcade.Window):
                             "N key: Give up and Start Over  (Vegas mode only) \n" \
                             "O key: Draw 3 ON/OFF (Vegas mode only) \n" \
                             "C key: Cumulative ON/OFF (Vegas mode only) \n" \
-                            "K key: Restart a new game after winning (Cumulative ON only)\n"
+                            "K key: Restart a new game after winning (Cumulative ON only)\n" \
+                            "D key: Winnable deals only OFF/easy/medium/hard (needs deals.bin from build_deals.py)\n" \
+                            "H key: Hints ON/OFF\n"
         # arcade.draw_text doesn't support \n for new line
         self.legend_lines = self.legend_txt.split("\n")
 
@@ -737,7 +860,7 @@ class Solitaire(arcade.Window):
 
 
 def table_setup():
-    global WINDOW_WIDTH, WINDOW_HEIGHT, SCREEN_TITLE, CARD_SCALE, MAT_HEIGHT, MAT_WIDTH, TOP_Y, MIDDLE_Y, LEFT_X, MIDDLE_X, RIGHT_X, X_SPACING, CARD_VALUES, CARD_SUITS, CARD_VERTICAL_OFFSET, PILE_COUNT, STOCK_PILE, TALON_PILE, TABLEAU_PILE_1, TABLEAU_PILE_7, FOUNDATION_PILE_1, FOUNDATION_PILE_4
+    global WINDOW_WIDTH, WINDOW_HEIGHT, SCREEN_TITLE, CARD_SCALE, MAT_HEIGHT, MAT_WIDTH, TOP_Y, MIDDLE_Y, LEFT_X, MIDDLE_X, RIGHT_X, X_SPACING, CARD_VERTICAL_OFFSET, PILE_COUNT, STOCK_PILE, TALON_PILE, TABLEAU_PILE_1, TABLEAU_PILE_7, FOUNDATION_PILE_1, FOUNDATION_PILE_4, DEAL_LIBRARY_FILE, THEME_PACK_FILE
     WINDOW_WIDTH = 1024
     WINDOW_HEIGHT = int(WINDOW_WIDTH * 0.75)
     SCREEN_TITLE = "Solitaire"
@@ -767,9 +890,6 @@ def table_setup():
     RIGHT_X = WINDOW_WIDTH - MAT_WIDTH / 2 - MAT_WIDTH * HORIZONTAL_MARGIN_PERCENT
     # How far apart each pile goes
     X_SPACING = MAT_WIDTH + MAT_WIDTH * HORIZONTAL_MARGIN_PERCENT
-    # Card
-    CARD_VALUES = ["A", "2", "3", "4", "5", "6", "7", "8", "9", "10", "J", "Q", "K"]
-    CARD_SUITS = ["Clubs", "Hearts", "Spades", "Diamonds"]
     # If we fan out cards stacked on each other, how far apart to fan them?
     CARD_VERTICAL_OFFSET = int(CARD_HEIGHT * CARD_SCALE * 0.4)
     # Constant for piles
@@ -787,15 +907,42 @@ def table_setup():
     FOUNDATION_PILE_2 = 10
     FOUNDATION_PILE_3 = 11
     FOUNDATION_PILE_4 = 12
+    # Winnable deals, written by build_deals.py
+    DEAL_LIBRARY_FILE = "deals.bin"
+    # Theme photos scaled to the window, written by build_themes.py
+    THEME_PACK_FILE = "themes.bin"
 
 
 table_setup()
 
 def main():
     """ Main function """
-    window = Solitaire()
+    parser = argparse.ArgumentParser(description="Solitaire")
+    parser.add_argument("--always-redraw", action="store_true",
+                        help="redraw every frame even when nothing changed")
+    parser.add_argument("--frame-stats", action="store_true",
+                        help="print frames drawn and skipped and CPU time used on exit")
+    parser.add_argument("--telemetry", metavar="FOLDER", default=None,
+                        help="write gameplay events to rotating files in FOLDER")
+    parser.add_argument("--no-hints", action="store_true",
+                        help="start with hints off, the search process only starts if H turns them on")
+    args = parser.parse_args()
+
+    telemetry = TelemetryWriter(args.telemetry) if args.telemetry else None
+    window = Solitaire(render_on_demand=not args.always_redraw, telemetry=telemetry, show_hints=not args.no_hints)
     window.new_game_setup()
+    started = time.perf_counter()
+    cpu_started = time.process_time()
     arcade.run()
+    if telemetry is not None:
+        telemetry.close()
+
+    if args.frame_stats:
+        wall_time = time.perf_counter() - started
+        cpu_time = time.process_time() - cpu_started
+        print(f"{window.frames_drawn} frames drawn, {window.frames_skipped} skipped in {wall_time:.1f}s, "
+              f"CPU {cpu_time:.1f}s ({100 * cpu_time / wall_time:.1f}% of one core), "
+              f"hint search CPU {window.hint_worker.search_cpu_time():.1f}s")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,265 @@
+from collections import namedtuple
+
+from card import CARD_COUNT, CARD_RANKS, CARD_SUIT_INDEXES, CARD_IS_RED, CAN_STACK_ON_TABLEAU, shuffle_card_ids
+
+# Pile numbers, the same as in solitaire.py. The solver keeps foundations by suit, so FOUNDATION_PILE means any of them
+STOCK_PILE = 0
+TALON_PILE = 1
+TABLEAU_PILE_1 = 2
+TABLEAU_PILE_7 = 8
+FOUNDATION_PILE = 9
+
+# Results of a search
+WON = "won"
+LOST = "lost"
+UNKNOWN = "unknown"
+
+DEFAULT_NODE_LIMIT = 200000
+
+RANK_COUNT = 13
+KING = 13
+SUIT_IS_RED = tuple(CARD_IS_RED[CARD_SUIT_INDEXES.index(suit_index)] for suit_index in range(4))
+
+# tableau: 7 tuples of card ids, bottom first. face_down: how many cards at the bottom of each are face down.
+# foundation: the top rank for each suit index, 0 when empty. stock and talon: card ids, top last.
+Position = namedtuple("Position", "tableau face_down foundation stock talon")
+
+# A move is (source pile, destination pile, card id). For a run of cards the card is the bottom one.
+# Drawing from the stock is (STOCK_PILE, TALON_PILE, None) and turning the talon over is (TALON_PILE, STOCK_PILE, None).
+
+
+def deal_position(seed):
+    """ The starting position of the deal the game makes for this seed """
+    stock = shuffle_card_ids(seed)
+    tableau = []
+    for pile_no in range(7):
+        tableau.append(tuple(stock.pop() for _ in range(pile_no + 1)))
+    return Position(tuple(tableau), tuple(len(pile) - 1 for pile in tableau), (0, 0, 0, 0), tuple(stock), ())
+
+
+def position_from_piles(piles):
+    """ The position of a game in progress. piles are lists of Card, numbered as in solitaire.py. """
+    tableau = []
+    face_down = []
+    for pile in piles[TABLEAU_PILE_1:TABLEAU_PILE_7 + 1]:
+        tableau.append(tuple(card.card_id for card in pile))
+        # a face down card on top is turned over with a click, so it counts as face up
+        down = 0
+        while down < len(pile) - 1 and pile[down].is_face_down():
+            down += 1
+        face_down.append(down)
+
+    foundation = [0, 0, 0, 0]
+    for pile in piles[FOUNDATION_PILE:]:
+        if pile:
+            foundation[pile[0].suit_index] = len(pile)
+
+    return Position(tuple(tableau), tuple(face_down), tuple(foundation),
+                    tuple(card.card_id for card in piles[STOCK_PILE]), tuple(card.card_id for card in piles[TALON_PILE]))
+
+
+def position_key(position):
+    """ Hashable key that treats the same piles in another tableau order as the same position """
+    return (tuple(sorted(zip(position.face_down, position.tableau))), position.foundation, position.stock,
+            position.talon)
+
+
+def can_go_to_foundation(position, card_id):
+    return position.foundation[CARD_SUIT_INDEXES[card_id]] == CARD_RANKS[card_id] - 1
+
+
+def is_safe_for_foundation(position, card_id):
+    """ Putting this card up can never be a mistake: no card left could need to go on it """
+    rank = CARD_RANKS[card_id]
+    if rank <= 2:
+        return True
+    is_red = CARD_IS_RED[card_id]
+    return all(top >= rank - 1 for suit_index, top in enumerate(position.foundation) if SUIT_IS_RED[suit_index] != is_red)
+
+
+def add_to_foundation(foundation, card_id):
+    foundation = list(foundation)
+    foundation[CARD_SUIT_INDEXES[card_id]] += 1
+    return tuple(foundation)
+
+
+def take_from_tableau(position, pile_no, start):
+    """ Tableau and face down counts after taking the cards from start up off a pile, flipping the new top card """
+    tableau = list(position.tableau)
+    face_down = list(position.face_down)
+    tableau[pile_no] = tableau[pile_no][:start]
+    if face_down[pile_no] > 0 and face_down[pile_no] == len(tableau[pile_no]):
+        face_down[pile_no] -= 1
+    return tableau, face_down
+
+
+def legal_moves(position, draw_count, only_safe_move=True):
+    """ List of (move, next position), most promising first.
+    With only_safe_move, a safe move to the foundation is returned on its own since nothing else can beat it. """
+    tableau, face_down, foundation, stock, talon = position
+    to_foundation = []
+    reveals = []
+    to_tableau = []
+    shuffles = []
+    from_foundation = []
+
+    # Tableau top cards to the foundation
+    for pile_no, pile in enumerate(tableau):
+        if pile and can_go_to_foundation(position, pile[-1]):
+            card_id = pile[-1]
+            new_tableau, new_face_down = take_from_tableau(position, pile_no, len(pile) - 1)
+            move = (TABLEAU_PILE_1 + pile_no, FOUNDATION_PILE, card_id)
+            nxt = Position(tuple(new_tableau), tuple(new_face_down), add_to_foundation(foundation, card_id), stock,
+                           talon)
+            if only_safe_move and is_safe_for_foundation(position, card_id):
+                return [(move, nxt)]
+            to_foundation.append((move, nxt))
+
+    # Talon top card to the foundation or the tableau
+    if talon:
+        card_id = talon[-1]
+        if can_go_to_foundation(position, card_id):
+            move = (TALON_PILE, FOUNDATION_PILE, card_id)
+            nxt = Position(tableau, face_down, add_to_foundation(foundation, card_id), stock, talon[:-1])
+            if only_safe_move and is_safe_for_foundation(position, card_id):
+                return [(move, nxt)]
+            to_foundation.append((move, nxt))
+        moved_to_empty = False
+        for pile_no, pile in enumerate(tableau):
+            if pile and not CAN_STACK_ON_TABLEAU[card_id][pile[-1]]:
+                continue
+            if not pile:
+                # every empty pile is as good as the first one
+                if CARD_RANKS[card_id] != KING or moved_to_empty:
+                    continue
+                moved_to_empty = True
+            new_tableau = list(tableau)
+            new_tableau[pile_no] = pile + (card_id,)
+            to_tableau.append(((TALON_PILE, TABLEAU_PILE_1 + pile_no, card_id),
+                               Position(tuple(new_tableau), face_down, foundation, stock, talon[:-1])))
+
+    # Runs of face up cards from one tableau pile to another
+    for pile_no, pile in enumerate(tableau):
+        for start in range(face_down[pile_no], len(pile)):
+            card_id = pile[start]
+            moved_to_empty = False
+            for target_no, target in enumerate(tableau):
+                if target_no == pile_no:
+                    continue
+                if target:
+                    if not CAN_STACK_ON_TABLEAU[card_id][target[-1]]:
+                        continue
+                else:
+                    # a king already at the bottom gains nothing from an empty pile
+                    if CARD_RANKS[card_id] != KING or start == 0 or moved_to_empty:
+                        continue
+                    moved_to_empty = True
+                new_tableau, new_face_down = take_from_tableau(position, pile_no, start)
+                new_tableau[target_no] = target + pile[start:]
+                move = ((TABLEAU_PILE_1 + pile_no, TABLEAU_PILE_1 + target_no, card_id),
+                        Position(tuple(new_tableau), tuple(new_face_down), foundation, stock, talon))
+                if start == face_down[pile_no]:
+                    # turns a card over or empties a pile
+                    reveals.append(move)
+                else:
+                    # only splits a run, rarely what's needed
+                    shuffles.append(move)
+
+    # Foundation top cards back down to the tableau
+    for suit_index, top in enumerate(foundation):
+        if top == 0:
+            continue
+        card_id = suit_index * RANK_COUNT + top - 1
+        for pile_no, pile in enumerate(tableau):
+            if pile and CAN_STACK_ON_TABLEAU[card_id][pile[-1]]:
+                new_tableau = list(tableau)
+                new_tableau[pile_no] = pile + (card_id,)
+                new_foundation = list(foundation)
+                new_foundation[suit_index] -= 1
+                from_foundation.append(((FOUNDATION_PILE, TABLEAU_PILE_1 + pile_no, card_id),
+                                        Position(tuple(new_tableau), face_down, tuple(new_foundation), stock, talon)))
+
+    # Draw from the stock, or turn the talon over when the stock is empty
+    draws = []
+    if stock:
+        drawn = min(draw_count, len(stock))
+        draws.append(((STOCK_PILE, TALON_PILE, None),
+                      Position(tableau, face_down, foundation, stock[:-drawn], talon + stock[:-drawn - 1:-1])))
+    elif talon:
+        draws.append(((TALON_PILE, STOCK_PILE, None), Position(tableau, face_down, foundation, talon[::-1], ())))
+
+    return to_foundation + reveals + to_tableau + draws + shuffles + from_foundation
+
+
+def is_won(position):
+    return sum(position.foundation) == CARD_COUNT
+
+
+def can_finish(position, draw_count):
+    """ With nothing face down, every card left can go up in turn: the lowest card needed is always on top
+    of its tableau pile, or can be drawn when drawing one card at a time """
+    if any(position.face_down):
+        return False
+    return draw_count == 1 or not (position.stock or position.talon)
+
+
+def finish(position, draw_count):
+    """ Moves that play out a position can_finish says is won """
+    moves = []
+    while not is_won(position):
+        options = legal_moves(position, draw_count)
+        for move, nxt in options:
+            if move[1] == FOUNDATION_PILE:
+                break
+        else:
+            move, nxt = next((move, nxt) for move, nxt in options if move[2] is None)
+        moves.append(move)
+        position = nxt
+    return moves
+
+
+def solve(position, draw_count, node_limit=DEFAULT_NODE_LIMIT, cancel=None):
+    """ Depth first search for a win from position.
+
+    Returns (result, moves, nodes): WON with the moves that win, LOST when every reachable position was tried,
+    or UNKNOWN when node_limit ran out or cancel (a threading.Event) was set first.
+    """
+    start_key = position_key(position)
+    # key -> (parent key, move that led here)
+    parents = {start_key: None}
+    stack = [(position, start_key)]
+    nodes = 0
+
+    while stack:
+        position, key = stack.pop()
+        nodes += 1
+
+        if can_finish(position, draw_count):
+            moves = []
+            while parents[key] is not None:
+                key, move = parents[key]
+                moves.append(move)
+            moves.reverse()
+            return WON, moves + finish(position, draw_count), nodes
+
+        if nodes >= node_limit or (cancel is not None and nodes % 256 == 0 and cancel.is_set()):
+            return UNKNOWN, [], nodes
+
+        # pushed in reverse so the most promising move is tried first
+        for move, nxt in reversed(legal_moves(position, draw_count)):
+            nxt_key = position_key(nxt)
+            if nxt_key not in parents:
+                parents[nxt_key] = (key, move)
+                stack.append((nxt, nxt_key))
+
+    return LOST, [], nodes
+
+
+def replay(position, draw_count, moves):
+    """ Play moves from position, checking each one is legal. Returns the final position. """
+    for move in moves:
+        options = dict(legal_moves(position, draw_count, only_safe_move=False))
+        if move not in options:
+            raise ValueError(f"illegal move {move}")
+        position = options[move]
+    return position
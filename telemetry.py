@@ -0,0 +1,87 @@
+import json
+import os
+import queue
+import threading
+import time
+
+
+class TelemetryWriter:
+    """ Writes gameplay events to rotating JSON lines files from a background thread.
+
+    emit() only puts the event on a queue, so the game loop never waits on the disk. The writer thread
+    collects events into batches and writes a batch at a time.
+    """
+
+    def __init__(self, folder, batch_size=256, flush_interval=1.0, max_file_size=1024 * 1024, max_files=20):
+        self.folder = folder
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_file_size = max_file_size
+        self.max_files = max_files
+
+        # files are named after the session so runs never write over each other
+        self.session = time.strftime("%Y%m%d-%H%M%S")
+        self.file_number = 0
+        self.file = None
+
+        self.events = queue.SimpleQueue()
+        os.makedirs(folder, exist_ok=True)
+        self.thread = threading.Thread(target=self.run, name="telemetry-writer", daemon=True)
+        self.thread.start()
+
+    def emit(self, event, **fields):
+        """ Record an event with a monotonic timestamp. Never blocks. """
+        self.events.put({"t": round(time.monotonic(), 4), "e": event, **fields})
+
+    def close(self):
+        """ Write whatever is still queued and stop the writer thread """
+        # None wakes the writer up straight away, and everything queued before it still gets written
+        self.events.put(None)
+        self.thread.join()
+
+    def run(self):
+        stopping = False
+        while not stopping:
+            batch, stopping = self.next_batch()
+            if batch:
+                self.write(batch)
+        if self.file is not None:
+            self.file.close()
+
+    def next_batch(self):
+        """ Wait for events until the batch is full or flush_interval has passed since the first one.
+        Returns (batch, stopping), stopping is True once close() was called. """
+        batch = []
+        deadline = None
+        while len(batch) < self.batch_size:
+            timeout = self.flush_interval if deadline is None else deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                fields = self.events.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if fields is None:
+                return batch, True
+            batch.append(fields)
+            if deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+        return batch, False
+
+    def write(self, batch):
+        if self.file is None or self.file.tell() >= self.max_file_size:
+            self.rotate()
+        self.file.write("".join(json.dumps(fields, separators=(",", ":")) + "\n" for fields in batch))
+        self.file.flush()
+
+    def rotate(self):
+        """ Start a new file, removing the oldest ones past max_files """
+        if self.file is not None:
+            self.file.close()
+        self.file_number += 1
+        path = os.path.join(self.folder, f"telemetry-{self.session}-{self.file_number:04d}.jsonl")
+        self.file = open(path, "w")
+
+        files = sorted(name for name in os.listdir(self.folder) if name.startswith("telemetry-"))
+        for name in files[:-self.max_files]:
+            os.remove(os.path.join(self.folder, name))
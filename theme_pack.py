@@ -0,0 +1,63 @@
+import struct
+
+import PIL.Image
+
+from mapped_file import MappedFile, write_atomically
+
+# Header: magic, the window size the images were scaled to, the image count, then (name, offset) for each image.
+# Each image is width * height RGBA pixels, rows from the top.
+SIZE_FORMAT = "<III"
+ENTRY_FORMAT = "<64sQ"
+
+
+def scale_photo(path, width, height):
+    """ Decode a theme photo and scale it to width x height.
+    draft() has the JPEG decoder skip detail that the resize would throw away anyway. """
+    image = PIL.Image.open(path)
+    image.draft("RGB", (width, height))
+    return image.convert("RGBA").resize((width, height))
+
+
+class ThemePack(MappedFile):
+    """ Theme photos already scaled to the window, built offline by build_themes.py """
+
+    MAGIC = b"SOLTHEM1"
+
+    def read_header(self):
+        self.width, self.height, count = self.unpack(SIZE_FORMAT, len(self.MAGIC))
+        # photo path -> offset of its pixels
+        self.offsets = {}
+        offset = len(self.MAGIC) + struct.calcsize(SIZE_FORMAT)
+        for _ in range(count):
+            name, image_offset = self.unpack(ENTRY_FORMAT, offset)
+            self.need(image_offset + self.width * self.height * 4)
+            self.offsets[name.rstrip(b"\0").decode()] = image_offset
+            offset += struct.calcsize(ENTRY_FORMAT)
+
+    @classmethod
+    def open_for_window(cls, path, width, height):
+        """ Open the pack at path, or return None if it is missing, broken, or was built for another window size """
+        pack = cls.open(path)
+        if pack is not None and (pack.width, pack.height) != (width, height):
+            pack.close()
+            return None
+        return pack
+
+    def image(self, path):
+        """ The scaled image for a theme photo, or None if it isn't in the pack. Only its pages are read. """
+        offset = self.offsets.get(path)
+        if offset is None:
+            return None
+        pixels = self.data[offset:offset + self.width * self.height * 4]
+        return PIL.Image.frombuffer("RGBA", (self.width, self.height), pixels, "raw", "RGBA", 0, 1)
+
+
+def write_pack(path, width, height, images):
+    """ Write a pack file. images maps photo paths to RGBA images of width x height. """
+    header = bytearray(ThemePack.MAGIC)
+    header += struct.pack(SIZE_FORMAT, width, height, len(images))
+    offset = len(header) + struct.calcsize(ENTRY_FORMAT) * len(images)
+    for name in images:
+        header += struct.pack(ENTRY_FORMAT, name.encode(), offset)
+        offset += width * height * 4
+    write_atomically(path, [header] + [image.tobytes() for image in images.values()])